@@ -1,10 +1,14 @@
 # app_final.py
 import streamlit as st
 import pandas as pd
-import math
 import folium
 from streamlit_folium import st_folium
 import io
+from batch import update_result, apply_edits, aggregate_longitudes, bin_result, ERROR_LABELS
+from map_layers import add_batch_layers
+from plots import render_summary
+from store import prune_stores, store_dir, write_store
+from fixedpoint import degrees_to_mas, mas_to_dms, hours_to_us, us_to_hms, round_to
 
 st.set_page_config(page_title="Time Zone ↔ Longitude Converter", layout="wide")
 
@@ -12,13 +16,10 @@ st.set_page_config(page_title="Time Zone ↔ Longitude Converter", layout="wide"
 # Conversion helpers
 # ---------------------------
 def decimal_to_dms(decimal_deg):
+    # Split on the integer milli-arcsecond grid, so seconds never reach 60
     sign = 1 if decimal_deg >= 0 else -1
-    x = abs(decimal_deg)
-    d = int(math.floor(x))
-    rem = (x - d) * 60
-    m = int(math.floor(rem))
-    s = (rem - m) * 60
-    return sign, d, m, s
+    _, d, m, s_mas = mas_to_dms(degrees_to_mas(decimal_deg))
+    return sign, int(d), int(m), s_mas / 1000
 
 def dms_to_decimal(direction_str, deg, minutes, seconds):
     sign = 1
@@ -28,16 +29,10 @@ def dms_to_decimal(direction_str, deg, minutes, seconds):
     return sign * dec
 
 def decimal_hours_to_hms(hours):
+    # Split on whole milliseconds (the displayed precision), so no clamping is needed
     sign = 1 if hours >= 0 else -1
-    x = abs(hours)
-    h = int(math.floor(x))
-    rem = (x - h) * 60
-    m = int(math.floor(rem))
-    s = (rem - m) * 60
-    # Clamp
-    m = min(m, 59)
-    s = min(s, 59.999)
-    return sign, h, m, s
+    _, h, m, s_us = us_to_hms(round_to(hours_to_us(hours), 1000))
+    return sign, int(h), int(m), s_us / 1e6
 
 def hms_to_decimal_hours(sign_char, h, m, s):
     total = abs(int(h)) + int(m)/60.0 + float(s)/3600.0
@@ -49,6 +44,60 @@ def hours_to_longitude(decimal_hours):
 def longitude_to_hours(longitude):
     return longitude / 15.0
 
+# ---------------------------
+# Batch helpers
+# ---------------------------
+PAGE_ROWS = 1000
+STORE_ROOT = "converted_store"
+STORE_KEEP = 20  # most recent stores kept on the server
+
+def read_upload(uploaded):
+    uploaded.seek(0)
+    return pd.read_csv(uploaded) if uploaded.name.endswith(".csv") else pd.read_excel(uploaded)
+
+def load_upload(uploaded):
+    # Parsed once per uploaded file; later reruns reuse the frame in session state
+    source = st.session_state.get("batch_source")
+    if source is None or source["file_id"] != uploaded.file_id:
+        source = {"file_id": uploaded.file_id, "frame": read_upload(uploaded),
+                  "view": None, "editor_key": None, "version": 0, "changed": None}
+        st.session_state.batch_source = source
+    return source
+
+def apply_batch_edits():
+    # Fold the grid's pending edits (the state sent with this rerun) into the parsed upload
+    source = st.session_state.batch_source
+    delta = st.session_state.get(source["editor_key"]) or {}
+    if not any(delta.get(k) for k in ("edited_rows", "added_rows", "deleted_rows")):
+        return
+    source["frame"], labels = apply_edits(source["frame"], source["view"], delta)
+    if source["changed"] is not None:
+        source["changed"].update(labels)
+    source["version"] += 1  # remount the grid on the edited data
+
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def batch_map_aggregate(result_key, _lon, _lat):
+    # Aggregated once per result; later reruns only pay for the key lookup
+    return aggregate_longitudes(_lon, _lat)
+
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def batch_summary_png(result_key, _result):
+    # Binned and drawn once per result, not on every slider move
+    return render_summary(bin_result(_result))
+
+def convert_uploaded():
+    # Only rows edited since the last conversion are converted again; the editor
+    # reports them, so a fresh upload is the only time every row is hashed
+    apply_batch_edits()
+    source = st.session_state.batch_source
+    df = source["frame"]
+    batch = update_result(df, st.session_state.get("batch_result"),
+                          exact=st.session_state.get("batch_exact", False),
+                          changed=source["changed"])
+    batch["lat"] = pd.to_numeric(df["lat"], errors="coerce").to_numpy(dtype=float) if "lat" in df.columns else None
+    st.session_state.batch_result = batch
+    source["changed"] = set()
+
 # ---------------------------
 # Initialize session state
 # ---------------------------
@@ -146,6 +195,12 @@ with right_col:
     # Marker
     folium.Marker([st.session_state.clicked_lat, st.session_state.active_lon],
                   icon=folium.Icon(color="blue"), draggable=True).add_to(m)
+    # Batch overlay (pre-aggregated, constant size)
+    batch = st.session_state.get("batch_result")
+    if batch is not None and not batch["frame"].empty and st.session_state.get("batch_on_map"):
+        add_batch_layers(m, batch_map_aggregate(batch["key"],
+                                                batch["frame"]["longitude_decimal"].to_numpy(),
+                                                batch["lat"]))
     map_data = st_folium(m, width=1100, height=600, returned_objects=["last_clicked"])
 
 # ---------------------------
@@ -225,6 +280,9 @@ st.markdown("""
     - `sign` (+/-), `h` (0–12), `m` (0–59), `s` (0.0–59.999)
 - Make sure column names **match exactly**.
 - Empty rows or invalid entries will be flagged in the output.
+- Optional `lat` column places rows on the map; rows without it are drawn on the equator.
+- Bad rows can be fixed in the table after upload; converting again only recomputes edited rows.
+- An exact result (integer `longitude_mas` / `tz_us` columns) can be uploaded again to convert it back.
 """)
 
 # Templates
@@ -246,28 +304,44 @@ with col2:
                        "tz_to_lon_template.csv","text/csv")
 
 # File uploader
-uploaded = st.file_uploader("Upload your CSV/Excel file", type=["csv","xlsx"])
+uploaded = st.file_uploader("Upload your CSV/Excel file", type=["csv","xlsx"], key="batch_file")
 if uploaded:
-    df = pd.read_csv(uploaded) if uploaded.name.endswith(".csv") else pd.read_excel(uploaded)
-    st.dataframe(df.head())
-    if st.button("Convert Uploaded File"):
-        results = []
-        for _, r in df.iterrows():
-            try:
-                if {"dir","deg","min","sec"}.issubset(r.index):
-                    lon_val = dms_to_decimal(r["dir"], int(r["deg"]), int(r["min"]), float(r["sec"]))
-                    dh = longitude_to_hours(lon_val)
-                    sgn_h, hh, mm, ss = decimal_hours_to_hms(dh)
-                    results.append({"input_type":"lon->tz","longitude_decimal":lon_val,
-                                    "tz_sign":"+" if sgn_h>=0 else "-","tz_h":hh,"tz_m":mm,"tz_s":round(ss,3)})
-                elif {"sign","h","m","s"}.issubset(r.index):
-                    dh = hms_to_decimal_hours(r["sign"], int(r["h"]), int(r["m"]), float(r["s"]))
-                    dh_capped = max(-12, min(12, dh))
-                    lon_val = hours_to_longitude(dh_capped)
-                    sgn2, d_deg2, d_min2, d_sec2 = decimal_to_dms(lon_val)
-                    results.append({"input_type":"tz->lon","longitude_decimal":lon_val,
-                                    "lon_dir":"E" if sgn2>=0 else "W",
-                                    "lon_deg":d_deg2,"lon_min":d_min2,"lon_sec":round(d_sec2,3)})
-            except:
-                results.append({"error":"invalid row"})
-        st.dataframe(pd.DataFrame(results))
+    # The grid holds one page of the upload; edits are kept when switching pages
+    source = load_upload(uploaded)
+    pages = max(1, -(-len(source["frame"]) // PAGE_ROWS))
+    page = st.number_input(f"Input page (1–{pages})", 1, pages, 1, on_change=apply_batch_edits)
+    view = source["frame"].iloc[(page - 1) * PAGE_ROWS:page * PAGE_ROWS]
+    source["view"] = view.index
+    source["editor_key"] = f"batch_editor_{source['version']}_{page}"
+    st.data_editor(view, num_rows="dynamic", key=source["editor_key"])
+    st.checkbox("Exact fixed-point arithmetic (adds integer longitude_mas / tz_us columns)",
+                key="batch_exact")
+    st.button("Convert Uploaded File", on_click=convert_uploaded)
+else:
+    st.session_state.pop("batch_result", None)
+    st.session_state.pop("batch_source", None)
+
+batch = st.session_state.get("batch_result")
+if batch is not None:
+    result = batch["frame"]
+    st.caption(f"{batch['converted']} of {len(result)} rows converted in the last run")
+    if result.empty:
+        st.dataframe(result)
+    else:
+        # Only one page of the result is sent to the browser; the full table is a download
+        pages = -(-len(result) // PAGE_ROWS)
+        page = st.number_input(f"Result page (1–{pages})", 1, pages, 1)
+        view = result.iloc[(page - 1) * PAGE_ROWS:page * PAGE_ROWS]
+        st.dataframe(view.assign(error=view["error_code"].map(ERROR_LABELS)))
+        st.download_button("Download converted CSV", lambda: result.to_csv(index=False),
+                           "converted.csv", "text/csv")
+        st.checkbox("Show batch on map", key="batch_on_map")
+        st.image(batch_summary_png(batch["key"], result))
+        if st.button("Write binary store"):
+            # One directory per result under a fixed root; users never pick the path.  Sessions
+            # converting the same rows share it, and write_store swaps it in atomically.
+            path = store_dir(STORE_ROOT, batch["key"])
+            schema = write_store(result, path)
+            prune_stores(STORE_ROOT, STORE_KEEP)
+            st.success(f"Wrote {schema['rows']} rows × {len(schema['columns'])} columns to "
+                       f"{STORE_ROOT}/{batch['key']}/")
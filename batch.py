@@ -0,0 +1,390 @@
+"""Column-wise batch conversion shared by the Streamlit apps.
+
+Uploaded tables are converted a whole column at a time instead of row by row,
+so a result can be computed once, hashed and reused for every derived view.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+import fixedpoint as fp
+
+LON_TO_TZ_COLUMNS = ("dir", "deg", "min", "sec")
+TZ_TO_LON_COLUMNS = ("sign", "h", "m", "s")
+# Text result columns are categoricals, so patching a row writes a code in place
+SIGNS = ["+", "-"]
+DIRECTIONS = ["E", "W"]
+
+# Per-row status stored in the ``error_code`` column of every result
+ERR_OK = 0
+ERR_MISSING = 1
+ERR_INVALID = 2
+ERROR_LABELS = {ERR_OK: "", ERR_MISSING: "missing value", ERR_INVALID: "invalid row"}
+
+
+def _numeric(col, upper, lower=0):
+    # Valid values lie in [lower, upper); pd.read_csv parses "inf", which is as invalid as text
+    values = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float)
+    missing = col.isna().to_numpy().copy()
+    with np.errstate(invalid="ignore"):
+        invalid = ~((values >= lower) & (values < upper)) & ~missing
+    return values, missing, invalid
+
+
+def _error_codes(missing, invalid):
+    codes = np.full(missing.shape, ERR_OK, dtype=np.int8)
+    codes[invalid] = ERR_INVALID
+    codes[missing] = ERR_MISSING
+    return codes
+
+
+def _offset_parts(hours):
+    # H:M:S split on whole milliseconds (the displayed precision), as decimal_hours_to_hms in the apps
+    _, hh, mm, s_us = fp.us_to_hms(fp.round_to(fp.hours_to_us(np.abs(hours)), 1000))
+    return hh, mm, s_us / 1e6
+
+
+def _angle_parts(degrees):
+    # D:M:S split on whole milli-arcseconds, as decimal_to_dms in the apps
+    _, dd, dm, s_mas = fp.mas_to_dms(fp.degrees_to_mas(np.abs(degrees)))
+    return dd, dm, s_mas / 1000
+
+
+def _lon_to_tz(df, exact=False):
+    dirs = df["dir"]
+    missing = dirs.isna().to_numpy().copy()
+    if pd.api.types.is_string_dtype(dirs) or dirs.dtype == object:
+        west = dirs.str.strip().str.upper().str.startswith("W")
+        invalid = west.isna().to_numpy() & ~missing
+        west = west.fillna(False).to_numpy(dtype=bool)
+    else:
+        invalid = ~missing
+        west = np.zeros(len(df), dtype=bool)
+
+    # Whole degrees 0–180, minutes 0–59, seconds below 60; anything else is flagged
+    deg, deg_missing, deg_invalid = _numeric(df["deg"], 181)
+    mins, min_missing, min_invalid = _numeric(df["min"], 60)
+    secs, sec_missing, sec_invalid = _numeric(df["sec"], 60)
+    missing |= deg_missing | min_missing | sec_missing
+    invalid |= deg_invalid | min_invalid | sec_invalid
+    ok = ~(missing | invalid)
+    deg, mins, secs = (np.where(ok, v, 0.0) for v in (deg, mins, secs))
+    if exact:
+        mas = fp.dms_to_mas(deg, mins, secs, np.where(west, -1, 1))
+        return _lon_to_tz_fixed(df.index, mas, ok, _error_codes(missing, invalid))
+
+    lon = np.abs(np.trunc(deg)) + np.trunc(mins) / 60.0 + secs / 3600.0
+    lon = np.where(west, -lon, lon)
+    hours = lon / 15.0
+    hh, mm, ss = _offset_parts(hours)
+
+    return pd.DataFrame({
+        "input_type": pd.Categorical(np.full(len(df), "lon->tz")),
+        "longitude_decimal": np.where(ok, lon, np.nan),
+        "tz_sign": pd.Categorical(np.where(hours >= 0, "+", "-"), categories=SIGNS),
+        "tz_h": hh.astype(np.int16),
+        "tz_m": mm.astype(np.int16),
+        "tz_s": np.where(ok, ss, np.nan),
+        "error_code": _error_codes(missing, invalid),
+    }, index=df.index)
+
+
+def _lon_to_tz_fixed(index, mas, ok, codes):
+    us = fp.mas_to_us(mas)
+    # Round to the displayed millisecond before splitting, so 59.9995 s carries into the minute
+    sign, hh, mm, s_us = fp.us_to_hms(fp.round_to(us, 1000))
+    return pd.DataFrame({
+        "input_type": pd.Categorical(np.full(len(index), "lon->tz")),
+        "longitude_decimal": np.where(ok, mas / fp.MAS_PER_DEGREE, np.nan),
+        "longitude_mas": mas,
+        "tz_us": us,
+        "tz_sign": pd.Categorical(np.where(sign >= 0, "+", "-"), categories=SIGNS),
+        "tz_h": hh.astype(np.int16),
+        "tz_m": mm.astype(np.int16),
+        "tz_s": np.where(ok, s_us / 1e6, np.nan),
+        "error_code": codes,
+    }, index=index)
+
+
+def _tz_to_lon(df, exact=False):
+    signs = df["sign"]
+    missing = signs.isna().to_numpy().copy()
+    if pd.api.types.is_string_dtype(signs) or signs.dtype == object:
+        signs = signs.str.strip()
+        invalid = ~signs.isin(["+", "-"]).to_numpy() & ~missing
+        positive = (signs == "+").fillna(False).to_numpy(dtype=bool)
+    else:
+        invalid = ~missing
+        positive = np.zeros(len(df), dtype=bool)
+
+    # Whole hours 0–12, minutes 0–59, seconds below 60; anything else is flagged
+    h, h_missing, h_invalid = _numeric(df["h"], 13)
+    m, m_missing, m_invalid = _numeric(df["m"], 60)
+    s, s_missing, s_invalid = _numeric(df["s"], 60)
+    missing |= h_missing | m_missing | s_missing
+    invalid |= h_invalid | m_invalid | s_invalid
+    ok = ~(missing | invalid)
+    h, m, s = (np.where(ok, v, 0.0) for v in (h, m, s))
+    if exact:
+        us = fp.hms_to_us(h, m, s, np.where(positive, 1, -1))
+        return _tz_to_lon_fixed(df.index, us, ok, _error_codes(missing, invalid))
+
+    hours = np.abs(np.trunc(h)) + np.trunc(m) / 60.0 + s / 3600.0
+    hours = np.clip(np.where(positive, hours, -hours), -12, 12)
+    lon = hours * 15.0
+    dd, dm, ds = _angle_parts(lon)
+
+    return pd.DataFrame({
+        "input_type": pd.Categorical(np.full(len(df), "tz->lon")),
+        "longitude_decimal": np.where(ok, lon, np.nan),
+        "lon_dir": pd.Categorical(np.where(lon >= 0, "E", "W"), categories=DIRECTIONS),
+        "lon_deg": dd.astype(np.int16),
+        "lon_min": dm.astype(np.int16),
+        "lon_sec": np.where(ok, ds, np.nan),
+        "error_code": _error_codes(missing, invalid),
+    }, index=df.index)
+
+
+def _tz_to_lon_fixed(index, us, ok, codes):
+    us = np.clip(us, -fp.MAX_OFFSET_US, fp.MAX_OFFSET_US)
+    mas = fp.us_to_mas(us)
+    sign, dd, dm, s_mas = fp.mas_to_dms(mas)
+    return pd.DataFrame({
+        "input_type": pd.Categorical(np.full(len(index), "tz->lon")),
+        "longitude_decimal": np.where(ok, mas / fp.MAS_PER_DEGREE, np.nan),
+        "longitude_mas": mas,
+        "tz_us": us,
+        "lon_dir": pd.Categorical(np.where(sign >= 0, "E", "W"), categories=DIRECTIONS),
+        "lon_deg": dd.astype(np.int16),
+        "lon_min": dm.astype(np.int16),
+        "lon_sec": np.where(ok, s_mas / 1000, np.nan),
+        "error_code": codes,
+    }, index=index)
+
+
+def _from_fixed(df, column, limit, convert):
+    # Integer mas / µs input within ±limit; non-integral values are invalid rather than rounded
+    values, missing, invalid = _numeric(df[column], limit + 1, -limit)
+    invalid |= ~missing & ~invalid & (values != np.round(values))
+    codes = _error_codes(missing, invalid)
+    if "error_code" in df.columns:
+        # Rows of a fed-back result keep their flag (their integer columns hold 0)
+        previous = pd.to_numeric(df["error_code"], errors="coerce").fillna(ERR_INVALID).to_numpy()
+        codes = np.where(previous != ERR_OK, previous, codes).astype(np.int8)
+    ok = codes == ERR_OK
+    return convert(df.index, np.where(ok, values, 0).astype(np.int64), ok, codes)
+
+
+def convert_frame(df, exact=False):
+    """Convert an uploaded table in one pass over its columns.
+
+    Tables with ``dir, deg, min, sec`` columns are converted longitude → time zone,
+    tables with ``sign, h, m, s`` columns time zone → longitude.  The result keeps
+    the input index and carries an ``error_code`` column (see ``ERROR_LABELS``);
+    a table with neither set of columns gives an empty result.
+
+    With ``exact=True`` the conversion runs on the integer core in ``fixedpoint``
+    and the result also carries ``longitude_mas`` / ``tz_us`` int64 columns.
+    Either way the D:M:S / H:M:S columns are split on an integer grid, so
+    seconds never show as 60.
+
+    A table with a ``tz_us`` or ``longitude_mas`` column (and neither set above)
+    is converted exactly from those integers; an exact result fed back in is
+    converted in the opposite direction of its ``input_type``.  Longitude → time
+    zone → longitude gives back the same ``longitude_mas``; the other way round
+    gives back the same ``tz_us`` for offsets on whole milliseconds.
+    """
+    if set(LON_TO_TZ_COLUMNS).issubset(df.columns):
+        return _lon_to_tz(df, exact)
+    if set(TZ_TO_LON_COLUMNS).issubset(df.columns):
+        return _tz_to_lon(df, exact)
+    if "tz_us" in df.columns or "longitude_mas" in df.columns:
+        from_offset = "longitude_mas" not in df.columns or (
+            "tz_us" in df.columns and "input_type" in df.columns
+            and (df["input_type"] == "lon->tz").any())
+        if from_offset:
+            return _from_fixed(df, "tz_us", fp.MAX_OFFSET_US, _tz_to_lon_fixed)
+        return _from_fixed(df, "longitude_mas", 180 * fp.MAS_PER_DEGREE, _lon_to_tz_fixed)
+    return pd.DataFrame(index=df.index[:0])
+
+
+def result_hash(result):
+    """Digest of a result frame, used as the cache key for views derived from it."""
+    digest = hashlib.sha1(",".join(map(str, result.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(result, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def row_hashes(df):
+    """One uint64 per row, covering the row's index label and values."""
+    # A writable copy, so update_result can patch edited rows in place
+    return pd.util.hash_pandas_object(df, index=True).to_numpy().copy()
+
+
+def apply_edits(df, view_index, delta):
+    """Apply a ``st.data_editor`` delta to ``df``.
+
+    ``delta`` is the editor's session-state value (``edited_rows``, ``added_rows``,
+    ``deleted_rows``) for a grid that showed the rows ``view_index`` of ``df``;
+    its row positions are relative to that view.  Added rows get new integer
+    labels after the largest one in ``df``.  Cell edits are written into ``df``
+    itself, so the parsed upload is not copied for every change.
+
+    Returns the edited frame and the labels of the edited or added rows.
+    """
+    changed = []
+    for pos, values in delta.get("edited_rows", {}).items():
+        label = view_index[int(pos)]
+        for col, value in values.items():
+            try:
+                df.loc[label, col] = value
+            except TypeError:
+                # e.g. text typed into a numeric column; conversion flags it as invalid
+                df[col] = df[col].astype(object)
+                df.loc[label, col] = value
+        changed.append(label)
+
+    deleted = [view_index[int(pos)] for pos in delta.get("deleted_rows", [])]
+    if deleted:
+        df = df.drop(index=deleted)
+    added = delta.get("added_rows", [])
+    if added:
+        start = int(df.index.max()) + 1 if len(df) else 0
+        labels = list(range(start, start + len(added)))
+        df = pd.concat([df, pd.DataFrame(added, index=labels, columns=df.columns)])
+        changed += labels
+    return df, [label for label in changed if label not in deleted]
+
+
+def update_result(df, previous=None, exact=False, changed=None):
+    """Convert ``df``, reconverting only rows that changed since ``previous``.
+
+    ``previous`` is the dict returned by an earlier call (or None).  Rows are
+    matched by index label and compared by ``row_hashes``; unchanged rows are
+    copied from the previous result and only new or edited rows go through
+    ``convert_frame``.  A change of columns or of ``exact`` reconverts everything.
+
+    If the caller already knows which rows were edited (``changed``: their index
+    labels, e.g. from ``apply_edits``), only those and new rows are hashed and
+    the hashes of all other rows are taken from ``previous``.  When, in addition,
+    no rows were added or deleted (``df`` has the index of ``previous``), the
+    previous frame and hashes are patched in place at the edited positions and
+    reused, so the cost does not depend on the size of the file; ``previous``
+    must not be used afterwards.
+
+    Returns a dict with the result under ``frame``, a ``key`` identifying it
+    (a digest of the input row hashes), the number of ``converted`` rows and the
+    bookkeeping needed for the next call.
+    """
+    if (previous is None or previous["frame"].empty
+            or previous["columns"] != tuple(df.columns)
+            or previous["exact"] != exact):
+        hashes = row_hashes(df)
+        changed = np.ones(len(df), dtype=bool)
+        result = convert_frame(df, exact)
+    elif changed is not None and df.index.equals(previous["index"]):
+        # Cell edits only: patch the edited rows of the previous frame and hashes by position
+        rows = previous["index"].get_indexer(list(changed))
+        result, hashes = previous["frame"], previous["hashes"]
+        if rows.size:
+            fresh = convert_frame(df.iloc[rows], exact)
+            for i, col in enumerate(result.columns):
+                result.iloc[rows, i] = fresh[col].to_numpy()
+            hashes[rows] = row_hashes(df.iloc[rows])
+        changed = rows
+    else:
+        pos = previous["index"].get_indexer(df.index)
+        if changed is None:
+            hashes = row_hashes(df)
+            changed = pos < 0
+            kept = np.flatnonzero(~changed)
+            changed[kept] = previous["hashes"][pos[kept]] != hashes[kept]
+        else:
+            changed = (pos < 0) | df.index.isin(list(changed))
+            hashes = previous["hashes"][np.where(changed, 0, pos)]
+            rows = np.flatnonzero(changed)
+            hashes[rows] = row_hashes(df.iloc[rows])
+        result = previous["frame"].iloc[np.where(changed, 0, pos)].copy()
+        result.index = df.index
+        rows = np.flatnonzero(changed)
+        if rows.size:
+            fresh = convert_frame(df.iloc[rows], exact)
+            for i, col in enumerate(result.columns):
+                result.iloc[rows, i] = fresh[col].to_numpy()
+
+    digest = hashlib.sha1(",".join(map(str, df.columns)).encode())
+    digest.update(b"exact" if exact else b"float")
+    digest.update(hashes.tobytes())
+    return {
+        "frame": result,
+        "key": digest.hexdigest(),
+        "converted": int(changed.sum()) if changed.dtype == bool else int(changed.size),
+        "index": df.index,
+        "hashes": hashes,
+        "columns": tuple(df.columns),
+        "exact": exact,
+    }
+
+
+def aggregate_longitudes(lon, lat=None, band_width=1.0, zone_width=15.0,
+                         sample_size=500, seed=0):
+    """Reduce a column of longitudes to map layers of bounded size.
+
+    Returns a dict with
+    - ``bands``: point counts per ``band_width``-degree longitude band,
+    - ``clusters``: count and mean position per ``zone_width``-degree zone,
+      centred on the time-zone meridians (0°, ±15°, ...),
+    - ``sample``: at most ``sample_size`` points drawn at random.
+    The size of each layer depends only on the parameters, never on ``len(lon)``.
+    Points without a latitude are placed on the equator.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.zeros_like(lon) if lat is None else np.asarray(lat, dtype=float)
+    ok = np.isfinite(lon) & np.isfinite(lat)
+    lon = np.clip(lon[ok], -180.0, 180.0)
+    lat = np.clip(lat[ok], -90.0, 90.0)
+
+    edges = np.linspace(-180.0, 180.0, int(round(360.0 / band_width)) + 1)
+    counts, _ = np.histogram(lon, bins=edges)
+
+    half = int(round(180.0 / zone_width))
+    zone = np.rint(lon / zone_width).astype(np.int64) + half
+    n_zones = 2 * half + 1
+    zone_count = np.bincount(zone, minlength=n_zones)
+    keep = zone_count > 0
+    zone_lon = np.bincount(zone, weights=lon, minlength=n_zones)[keep] / zone_count[keep]
+    zone_lat = np.bincount(zone, weights=lat, minlength=n_zones)[keep] / zone_count[keep]
+
+    rng = np.random.default_rng(seed)
+    take = rng.choice(lon.size, size=min(sample_size, lon.size), replace=False)
+
+    return {
+        "total": int(lon.size),
+        "bands": {"edges": edges, "counts": counts},
+        "clusters": {"lon": zone_lon, "lat": zone_lat, "count": zone_count[keep]},
+        "sample": {"lon": lon[take], "lat": lat[take]},
+    }
+
+
+def bin_result(result, offset_step=0.5, band_width=15.0):
+    """Bin a converted result for the summary charts.
+
+    Only the typed result columns are touched: ``longitude_decimal`` gives both the
+    UTC offset histogram (``offset_step`` hours wide, over ±12 h) and the longitude
+    band counts, ``error_code`` the per-code row counts.  The output size depends
+    only on the bin widths.
+    """
+    lon = result["longitude_decimal"].to_numpy(dtype=float)
+    lon = lon[np.isfinite(lon)]
+    offset_edges = np.linspace(-12.0, 12.0, int(round(24.0 / offset_step)) + 1)
+    offset_counts, _ = np.histogram(np.clip(lon / 15.0, -12.0, 12.0), bins=offset_edges)
+    band_edges = np.linspace(-180.0, 180.0, int(round(360.0 / band_width)) + 1)
+    band_counts, _ = np.histogram(np.clip(lon, -180.0, 180.0), bins=band_edges)
+    codes = result["error_code"].to_numpy()
+    error_counts = np.bincount(codes, minlength=len(ERROR_LABELS))
+    return {
+        "offset": {"edges": offset_edges, "counts": offset_counts},
+        "bands": {"edges": band_edges, "counts": band_counts},
+        "errors": {"codes": np.arange(error_counts.size), "counts": error_counts},
+    }
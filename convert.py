@@ -0,0 +1,40 @@
+"""Headless batch converter.
+
+    python convert.py input.csv --csv converted.csv --store converted/
+
+Reads a CSV/Excel file laid out like the app uploads, converts it with
+``batch.convert_frame`` and writes the result as CSV and/or a memory-mapped
+column store (see ``store.py``).
+"""
+import argparse
+
+import pandas as pd
+
+from batch import convert_frame
+from store import write_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a batch of longitudes / UTC offsets.")
+    parser.add_argument("input", help="CSV or Excel (.xlsx) file")
+    parser.add_argument("--csv", help="write the result as CSV to this file")
+    parser.add_argument("--store", help="write the result as a column store to this directory")
+    parser.add_argument("--exact", action="store_true",
+                        help="convert with the integer fixed-point core (adds longitude_mas / tz_us)")
+    args = parser.parse_args(argv)
+    if not args.csv and not args.store:
+        parser.error("nothing to do: give --csv and/or --store")
+
+    df = pd.read_csv(args.input) if args.input.endswith(".csv") else pd.read_excel(args.input)
+    result = convert_frame(df, exact=args.exact)
+    if result.empty:
+        parser.error("columns not recognized for conversion")
+    if args.csv:
+        result.to_csv(args.csv, index=False)
+    if args.store:
+        write_store(result, args.store)
+    print(f"Converted {len(result)} rows ({int((result['error_code'] != 0).sum())} flagged)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Exact fixed-point core for longitude / UTC offset conversion.
+
+Angles are held as int64 milli-arcseconds (mas) and offsets as int64
+microseconds (µs).  Floats are rounded once on the way in; after that every
+split into D:M:S / H:M:S is an integer divmod, so there is nothing to clamp and
+no 59.9999-second artefacts.
+
+One degree is 240 s of time, so 1 mas = 200/3 µs.  ``mas_to_us`` and
+``us_to_mas`` round to the nearest unit; because a µs is finer than a mas,
+mas → µs → mas is exact, and so is µs → mas → µs for offsets given to the
+millisecond (1 ms = 15 mas).
+
+All functions accept scalars or NumPy arrays.  Values whose magnitude exceeds
+``LIMIT`` units (or are not finite) raise ``ValueError`` instead of wrapping
+around in the int64 arithmetic.
+"""
+import numpy as np
+
+MAS_PER_DEGREE = 3_600_000
+US_PER_HOUR = 3_600_000_000
+MAX_OFFSET_US = 12 * US_PER_HOUR
+# Largest |mas| / |µs| accepted; keeps every intermediate product inside int64
+LIMIT = 2 ** 53
+
+
+def _check(total):
+    # ``total`` is the value in the target unit, computed in float before any integer cast
+    total = np.abs(np.asarray(total, dtype=float))
+    if not np.all(total <= LIMIT):
+        raise ValueError(f"Value outside the fixed-point range (|x| <= {LIMIT} units, finite)")
+
+
+def round_div(n, d):
+    """Integer ``n / d`` rounded half away from zero."""
+    n = np.asarray(n, dtype=np.int64)
+    q = (np.abs(n) * 2 + d) // (2 * d)
+    return np.where(n < 0, -q, q)
+
+
+def round_to(n, step):
+    """Integer ``n`` rounded to the nearest multiple of ``step``."""
+    return round_div(n, step) * step
+
+
+def _split(total, unit, sub):
+    # |total| -> whole units, minutes, seconds; ``unit`` and ``sub`` are counts per unit / per second
+    sign = np.where(total < 0, -1, 1)
+    whole, rem = np.divmod(np.abs(total), unit)
+    minutes, seconds = np.divmod(rem, sub * 60)
+    return sign, whole, minutes, seconds
+
+
+def dms_to_mas(deg, minutes, seconds, sign=1):
+    """D:M:S (seconds may be fractional) to milli-arcseconds."""
+    _check(np.abs(np.asarray(deg, dtype=float)) * MAS_PER_DEGREE
+           + np.abs(np.asarray(minutes, dtype=float)) * 60_000
+           + np.abs(np.asarray(seconds, dtype=float)) * 1000)
+    mas = (np.abs(np.asarray(deg, dtype=np.int64)) * MAS_PER_DEGREE
+           + np.abs(np.asarray(minutes, dtype=np.int64)) * 60_000
+           + np.rint(np.abs(np.asarray(seconds, dtype=float)) * 1000).astype(np.int64))
+    return np.where(np.asarray(sign) >= 0, mas, -mas)
+
+
+def mas_to_dms(mas):
+    """Milli-arcseconds to ``(sign, deg, minutes, seconds_mas)``, all integers."""
+    return _split(np.asarray(mas, dtype=np.int64), MAS_PER_DEGREE, 1000)
+
+
+def hms_to_us(h, m, s, sign=1):
+    """H:M:S (seconds may be fractional) to microseconds."""
+    _check(np.abs(np.asarray(h, dtype=float)) * US_PER_HOUR
+           + np.abs(np.asarray(m, dtype=float)) * 60_000_000
+           + np.abs(np.asarray(s, dtype=float)) * 1_000_000)
+    us = (np.abs(np.asarray(h, dtype=np.int64)) * US_PER_HOUR
+          + np.abs(np.asarray(m, dtype=np.int64)) * 60_000_000
+          + np.rint(np.abs(np.asarray(s, dtype=float)) * 1_000_000).astype(np.int64))
+    return np.where(np.asarray(sign) >= 0, us, -us)
+
+
+def us_to_hms(us):
+    """Microseconds to ``(sign, h, m, seconds_us)``, all integers."""
+    return _split(np.asarray(us, dtype=np.int64), US_PER_HOUR, 1_000_000)
+
+
+def degrees_to_mas(degrees):
+    mas = np.asarray(degrees, dtype=float) * MAS_PER_DEGREE
+    _check(mas)
+    return np.rint(mas).astype(np.int64)
+
+
+def hours_to_us(hours):
+    us = np.asarray(hours, dtype=float) * US_PER_HOUR
+    _check(us)
+    return np.rint(us).astype(np.int64)
+
+
+def mas_to_us(mas):
+    """Longitude in mas to UTC offset in µs (15° per hour)."""
+    mas = np.asarray(mas, dtype=np.int64)
+    _check(mas)
+    return round_div(mas * 200, 3)
+
+
+def us_to_mas(us):
+    """UTC offset in µs to longitude in mas (15° per hour)."""
+    us = np.asarray(us, dtype=np.int64)
+    _check(us)
+    return round_div(us * 3, 200)
@@ -0,0 +1,356 @@
+"""Concurrent-session load test for the Streamlit apps.
+
+    python loadtest.py app3.py --sessions 50 --actions 20 --save run.json
+    python loadtest.py app3.py --sessions 50 --compare run.json
+
+Starts ``streamlit run <app>`` on a local port (or uses ``--url``) and opens one
+websocket per simulated session, speaking the same protobuf messages as the
+browser.  After every session has loaded the page, all of them perform a random
+mix of
+- ``slider``: move the longitude slider,
+- ``map_click``: send the value the st_folium component reports for a click,
+- ``upload``: upload a generated CSV, convert it and show it on the map.
+
+A rerun is timed from sending its ``rerun_script`` message to the
+``script_finished`` that ends it, so reruns the app requests itself
+(``st.experimental_rerun``) are included.  The report gives p50/p95/p99 rerun
+latency overall and per action, reruns per second, server memory per session
+and the reruns in which the app raised or timed out.  A session whose rerun does
+not finish even after ``stop_script``, or whose connection fails, is dropped and
+counted under ``dropped_sessions``; the others carry on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import numpy as np
+import requests
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import DoubleArray, FileUploaderState, FileURLsRequest, UploadedFileInfo
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+ACTIONS = ("slider", "map_click", "upload")
+ACTION_WEIGHTS = (0.6, 0.3, 0.1)
+FINISHED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+            ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+# A session that hits one of these no longer gets answers from the server and is dropped
+DROP_ERRORS = (asyncio.TimeoutError, websockets.ConnectionClosed, requests.RequestException, OSError)
+
+
+def rss_bytes(pid):
+    """Resident set size of process ``pid``, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def sample_upload(rng, rows):
+    """CSV bytes for a longitude → time zone upload with ``rows`` random rows."""
+    lines = ["dir,deg,min,sec"]
+    dirs = rng.choice(["E", "W"], rows)
+    deg, mins, secs = rng.integers(0, 180, rows), rng.integers(0, 60, rows), rng.uniform(0, 60, rows)
+    lines += [f"{d},{a},{b},{c:.3f}" for d, a, b, c in zip(dirs, deg, mins, secs)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+class Session:
+    """One simulated browser tab connected to the app's websocket."""
+
+    def __init__(self, url, timeout):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session_id = None
+        self.widgets = {}   # (element type, label) -> widget id, from the latest run
+        self.sticky = {}    # widget id -> WidgetState re-sent on every rerun, like the browser
+        self.timings = []   # (action, seconds, error)
+        self.dropped = False
+
+    async def connect(self):
+        ws_url = self.url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = await websockets.connect(ws_url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        await self.ws.close()
+
+    async def drop(self, action, error):
+        """Record ``error`` as a failed ``action`` and stop using this session."""
+        self.timings.append((action, 0.0, f"session dropped: {error!r}"))
+        self.dropped = True
+        await self.close()
+
+    async def _recv(self):
+        msg = ForwardMsg()
+        msg.ParseFromString(await self.ws.recv())
+        return msg
+
+    async def rerun(self, action, *states):
+        """Rerun the script with ``states`` on top of the sticky widget values."""
+        widgets = dict(self.sticky)
+        widgets.update((s.id, s) for s in states)
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.widget_states.widgets.extend(widgets.values())
+
+        start = time.perf_counter()
+        await self.ws.send(back.SerializeToString())
+        try:
+            error = await asyncio.wait_for(self._until_finished(), self.timeout)
+        except asyncio.TimeoutError:
+            error = f"no script_finished within {self.timeout:g}s"
+            stop = BackMsg()
+            stop.stop_script = True
+            await self.ws.send(stop.SerializeToString())
+            # Raises TimeoutError again if the server does not even stop; the caller drops the session
+            await asyncio.wait_for(self._until_finished(), self.timeout)
+        self.timings.append((action, time.perf_counter() - start, error))
+        return error
+
+    async def _until_finished(self):
+        error = None
+        widgets = {}
+        while True:
+            msg = await self._recv()
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.session_id = msg.new_session.initialize.session_id or self.session_id
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                name = element.WhichOneof("type")
+                if name == "exception":
+                    error = error or f"{element.exception.type}: {element.exception.message}"
+                elif name in ("slider", "checkbox", "button", "file_uploader"):
+                    proto = getattr(element, name)
+                    widgets[(name, proto.label)] = proto.id
+                elif name == "component_instance":
+                    widgets[(name, element.component_instance.component_name)] = element.component_instance.id
+            elif kind == "script_finished" and msg.script_finished in FINISHED:
+                self.widgets = widgets
+                return error
+
+    def widget(self, kind, label):
+        """Id of the ``kind`` widget whose label contains ``label`` in the latest run."""
+        for (k, lbl), wid in self.widgets.items():
+            if k == kind and label in lbl:
+                return wid
+        raise LookupError(f"no {kind} labelled {label!r} in the last run")
+
+    async def upload(self, name, data):
+        """Upload ``data`` the way the file uploader does and return its widget state."""
+        request_id = uuid.uuid4().hex
+        back = BackMsg()
+        back.file_urls_request.CopyFrom(FileURLsRequest(
+            request_id=request_id, file_names=[name], session_id=self.session_id))
+        await self.ws.send(back.SerializeToString())
+        while True:
+            msg = await asyncio.wait_for(self._recv(), self.timeout)
+            if msg.WhichOneof("type") == "file_urls_response" \
+                    and msg.file_urls_response.response_id == request_id:
+                break
+        urls = msg.file_urls_response.file_urls[0]
+        upload_url = urls.upload_url if urls.upload_url.startswith("http") else self.url + urls.upload_url
+        response = await asyncio.to_thread(
+            requests.put, upload_url, files={"file": (name, data, "text/csv")}, timeout=self.timeout)
+        response.raise_for_status()
+        info = UploadedFileInfo(name=name, size=len(data), file_id=urls.file_id, file_urls=urls)
+        return WidgetState(id=self.widget("file_uploader", ""),
+                           file_uploader_state_value=FileUploaderState(uploaded_file_info=[info]))
+
+
+async def run_actions(session, actions, rows, seed, weights=ACTION_WEIGHTS):
+    """Perform ``actions`` random actions in ``session``, drawn with ``weights`` from ``ACTIONS``."""
+    if session.dropped:
+        return
+    rng = np.random.default_rng(seed)
+    p = np.asarray(weights, dtype=float)
+    for action in rng.choice(ACTIONS, size=actions, p=p / p.sum()):
+        try:
+            if action == "slider":
+                state = WidgetState(id=session.widget("slider", "Longitude slider"),
+                                    double_array_value=DoubleArray(data=[round(float(rng.uniform(-180, 180)), 1)]))
+                session.sticky[state.id] = state
+                await session.rerun(action, state)
+            elif action == "map_click":
+                click = {"lat": float(rng.uniform(-85, 85)), "lng": float(rng.uniform(-180, 180))}
+                state = WidgetState(id=session.widget("component_instance", "st_folium"),
+                                    json_value=json.dumps({"last_clicked": click}))
+                session.sticky[state.id] = state
+                await session.rerun(action, state)
+            else:
+                state = await session.upload("batch.csv", sample_upload(rng, rows))
+                session.sticky[state.id] = state
+                if await session.rerun(action, state):
+                    continue
+                convert = WidgetState(id=session.widget("button", "Convert Uploaded File"),
+                                      trigger_value=True)
+                if await session.rerun(action, convert):
+                    continue
+                overlay = WidgetState(id=session.widget("checkbox", "Show batch on map"), bool_value=True)
+                session.sticky[overlay.id] = overlay
+                await session.rerun(action, overlay)
+        except LookupError as e:
+            # The previous rerun raised before drawing the widget this action needs
+            session.timings.append((action, 0.0, str(e)))
+        except DROP_ERRORS as e:
+            await session.drop(action, e)
+            return
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/max of a list of durations, in milliseconds."""
+    ms = np.asarray(seconds, dtype=float) * 1000.0
+    if not ms.size:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": int(ms.size), "p50": round(float(p50), 1), "p95": round(float(p95), 1),
+            "p99": round(float(p99), 1), "max": round(float(ms.max()), 1)}
+
+
+def summarize(timings, sessions, wall, memory_bytes):
+    """Report dict from ``(action, seconds, error)`` tuples collected over ``wall`` seconds."""
+    reruns = [s for action, s, e in timings if action != "load" and s]
+    return {
+        "sessions": sessions,
+        "reruns": len(reruns),
+        "failed_reruns": sum(1 for _, _, e in timings if e),
+        "dropped_sessions": sum(1 for _, _, e in timings if e and e.startswith("session dropped")),
+        "errors": sorted({e for _, _, e in timings if e})[:10],
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(reruns) / wall, 2) if wall else None,
+        "memory_per_session_mb": None if memory_bytes is None
+        else round(memory_bytes / sessions / 2**20, 1),
+        "latency_ms": latency_summary(reruns),
+        "per_action": {a: latency_summary([s for action, s, _ in timings if action == a and s])
+                       for a in ("load",) + ACTIONS},
+    }
+
+
+async def _load(session):
+    try:
+        await session.rerun("load")
+    except DROP_ERRORS as e:
+        await session.drop("load", e)
+
+
+async def _run(url, pid, sessions, actions, rows, seed, timeout, weights):
+    base_rss = rss_bytes(pid) if pid else None
+    clients = [Session(url, timeout) for _ in range(sessions)]
+    await asyncio.gather(*(c.connect() for c in clients))
+    await asyncio.gather(*(_load(c) for c in clients))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_actions(c, actions, rows, seed + i, weights) for i, c in enumerate(clients)))
+    wall = time.perf_counter() - start
+    end_rss = rss_bytes(pid) if pid else None
+    await asyncio.gather(*(c.close() for c in clients if not c.dropped))
+
+    memory = end_rss - base_rss if base_rss is not None and end_rss is not None else None
+    return summarize([t for c in clients for t in c.timings], sessions, wall, memory)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port, timeout=60):
+    """Launch ``streamlit run app`` headless on ``port`` and wait until it is healthy."""
+    cmd = [sys.executable, "-m", "streamlit", "run", app,
+           "--server.headless", "true", "--server.port", str(port),
+           "--server.address", "127.0.0.1", "--server.fileWatcherType", "none",
+           "--server.enableXsrfProtection", "false", "--server.enableCORS", "false",
+           "--browser.gatherUsageStats", "false"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {proc.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/_stcore/health", timeout=1).ok:
+                return proc
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"streamlit did not become healthy within {timeout}s")
+
+
+def run(app, sessions=10, actions=20, rows=1000, seed=0, timeout=60, url=None,
+        weights=ACTION_WEIGHTS):
+    """Load-test ``app`` (or the server at ``url``) and return the report dict."""
+    proc = None
+    if url is None:
+        port = _free_port()
+        proc = start_server(app, port)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        report = asyncio.run(_run(url, proc.pid if proc else None,
+                                  sessions, actions, rows, seed, timeout, weights))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    return {"app": app, "actions": actions, "rows": rows,
+            "mix": dict(zip(ACTIONS, map(float, weights))), **report}
+
+
+def compare(base, report):
+    """Lines comparing the headline numbers of two reports (``base`` → ``report``)."""
+    rows = [("throughput_rps", base["throughput_rps"], report["throughput_rps"]),
+            ("memory_per_session_mb", base["memory_per_session_mb"], report["memory_per_session_mb"])]
+    rows += [(f"latency_ms.{p}", base["latency_ms"][p], report["latency_ms"][p])
+             for p in ("p50", "p95", "p99")]
+    rows.append(("failed_reruns", base["failed_reruns"], report["failed_reruns"]))
+    lines = []
+    for name, old, new in rows:
+        if old is None or new is None:
+            lines.append(f"{name:24} {old!s:>10} → {new!s:>10}")
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        lines.append(f"{name:24} {old:>10} → {new:>10}  ({change})")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a Streamlit app with concurrent sessions.")
+    parser.add_argument("app", help="app script, e.g. app3.py")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--actions", type=int, default=20, help="actions per session")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per uploaded batch")
+    parser.add_argument("--mix", default=",".join(map(str, ACTION_WEIGHTS)),
+                        help="relative weights of slider,map_click,upload actions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed per rerun")
+    parser.add_argument("--url", help="use an already running server instead of starting one")
+    parser.add_argument("--save", help="write the report as JSON to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    weights = [float(w) for w in args.mix.split(",")]
+    if len(weights) != len(ACTIONS):
+        parser.error(f"--mix needs {len(ACTIONS)} weights")
+    report = run(args.app, args.sessions, args.actions, args.rows, args.seed, args.timeout,
+                 args.url, weights)
+    print(json.dumps(report, indent=2))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        print(f"\nCompared with {args.compare}:")
+        print("\n".join(compare(base, report)))
+
+
+if __name__ == "__main__":
+    main()
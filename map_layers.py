@@ -0,0 +1,70 @@
+"""Folium layers for drawing an aggregated batch result on the map.
+
+Everything drawn here comes from ``batch.aggregate_longitudes``, so the HTML sent
+to the browser stays the same size however many rows the batch had.
+"""
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+
+class ZoomSwitch(MacroElement):
+    """Show ``low`` below ``threshold`` zoom and ``high`` from it upwards."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var low = {{ this.low.get_name() }};
+            var high = {{ this.high.get_name() }};
+            function sync() {
+                if (map.getZoom() >= {{ this.threshold }}) {
+                    map.removeLayer(low); map.addLayer(high);
+                } else {
+                    map.removeLayer(high); map.addLayer(low);
+                }
+            }
+            map.on("zoomend", sync);
+            sync();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, low, high, threshold):
+        super().__init__()
+        self._name = "ZoomSwitch"
+        self.low = low
+        self.high = high
+        self.threshold = threshold
+
+
+def add_batch_layers(m, agg, zoom_threshold=5):
+    """Add density bands, zone clusters and a point sample for ``agg`` to map ``m``."""
+    bands = folium.FeatureGroup(name=f"Batch density ({agg['total']} points)")
+    edges, counts = agg["bands"]["edges"], agg["bands"]["counts"]
+    peak = counts.max() if counts.size and counts.max() > 0 else 1
+    for lo, hi, n in zip(edges[:-1], edges[1:], counts):
+        if n == 0:
+            continue
+        folium.Rectangle([[-85, lo], [85, hi]], stroke=False, fill=True,
+                         fill_color="red", fill_opacity=0.1 + 0.5 * n / peak,
+                         tooltip=f"{lo:g}° to {hi:g}°: {n} points").add_to(bands)
+    bands.add_to(m)
+
+    clusters = folium.FeatureGroup(name="Batch clusters", control=False)
+    c = agg["clusters"]
+    for lon, lat, n in zip(c["lon"], c["lat"], c["count"]):
+        folium.CircleMarker([lat, lon], radius=6 + 3 * len(str(n)), color="darkred",
+                            fill=True, fill_opacity=0.7,
+                            tooltip=f"{n} points").add_to(clusters)
+    clusters.add_to(m)
+
+    sample = folium.FeatureGroup(name="Batch sample", control=False)
+    s = agg["sample"]
+    for lon, lat in zip(s["lon"], s["lat"]):
+        folium.CircleMarker([lat, lon], radius=3, color="darkred", weight=1,
+                            fill=True, fill_opacity=0.8).add_to(sample)
+    sample.add_to(m)
+
+    ZoomSwitch(clusters, sample, zoom_threshold).add_to(m)
+    return m
@@ -0,0 +1,38 @@
+"""Summary charts for a converted batch.
+
+Charts are drawn from the binned counts of ``batch.bin_result``, never from the
+raw rows, and returned as PNG bytes so the apps can cache them per result.
+"""
+import io
+
+from matplotlib.figure import Figure
+
+from batch import ERROR_LABELS
+
+
+def render_summary(bins):
+    """Draw offset histogram, longitude band counts and error breakdown as one PNG."""
+    fig = Figure(figsize=(15, 4), tight_layout=True)
+    ax_off, ax_band, ax_err = fig.subplots(1, 3)
+
+    edges, counts = bins["offset"]["edges"], bins["offset"]["counts"]
+    ax_off.stairs(counts, edges, fill=True, color="#3A7AFE")
+    ax_off.set_title("UTC offset")
+    ax_off.set_xlabel("hours")
+    ax_off.set_ylabel("rows")
+
+    edges, counts = bins["bands"]["edges"], bins["bands"]["counts"]
+    ax_band.bar(edges[:-1], counts, width=edges[1:] - edges[:-1], align="edge",
+                color="green", edgecolor="white")
+    ax_band.set_title("Longitude bands")
+    ax_band.set_xlabel("degrees")
+    ax_band.set_xticks(edges[::4])
+
+    codes, counts = bins["errors"]["codes"], bins["errors"]["counts"]
+    labels = [ERROR_LABELS.get(int(c)) or "ok" for c in codes]
+    ax_err.bar(labels, counts, color=["green"] + ["firebrick"] * (len(labels) - 1))
+    ax_err.set_title("Row status")
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=80)
+    return buf.getvalue()
@@ -0,0 +1,173 @@
+"""Memory-mapped column store for converted batches.
+
+A store is a directory with one ``<column>.npy`` file per result column and a
+``schema.json`` header describing them.  Every column has a fixed width
+(numbers as-is, categories as integer codes, text as fixed-width bytes), so a
+reader can map the files and slice rows without loading the whole result.  The
+row index is stored the same way in ``_index.npy``.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch import result_hash
+
+SCHEMA_FILE = "schema.json"
+INDEX_FILE = "_index.npy"
+STORE_VERSION = 2
+
+
+def store_dir(root, name):
+    """Path of the store ``name`` directly under ``root``; anything else is refused."""
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, str(name)))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"Store {name!r} is outside {root}")
+    return path
+
+
+def _encode(values, name, file):
+    # Fixed-width array for a column (or the index) plus its schema entry
+    col = pd.Series(values)
+    entry = {"name": name, "file": file}
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        data = col.cat.codes.to_numpy()
+        entry["kind"] = "category"
+        entry["categories"] = [str(c) for c in col.cat.categories]
+    elif pd.api.types.is_numeric_dtype(col.dtype):
+        data = col.to_numpy()
+        entry["kind"] = "number"
+    else:
+        data = col.to_numpy(dtype=str).astype("S")
+        entry["kind"] = "text"
+    entry["dtype"] = data.dtype.str
+    return data, entry
+
+
+def _decode(values, entry):
+    if entry["kind"] == "category":
+        return pd.Categorical.from_codes(values, entry["categories"])
+    if entry["kind"] == "text":
+        return values.astype(str)
+    return np.asarray(values)
+
+
+def _read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        return json.load(f)
+
+
+def write_store(result, path):
+    """Write ``result`` to the store directory ``path`` and return its schema.
+
+    The store is written to a temporary directory next to ``path`` and renamed
+    into place, so a reader never sees a half-written store or columns of an
+    earlier one, and concurrent writers each install a complete store.  A
+    store already holding the same result is left as it is.
+    """
+    digest = result_hash(result)
+    try:
+        old = _read_schema(path)
+        if old.get("result_hash") == digest:
+            os.utime(path)  # counts as freshly written for prune_stores
+            return old
+    except FileNotFoundError:
+        pass  # no store yet, or another writer is just replacing it
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        columns = []
+        for name in result.columns:
+            data, entry = _encode(result[name], str(name), f"{name}.npy")
+            np.save(os.path.join(tmp, entry["file"]), data)
+            columns.append(entry)
+        data, index = _encode(result.index, None, INDEX_FILE)
+        np.save(os.path.join(tmp, INDEX_FILE), data)
+
+        schema = {
+            "version": STORE_VERSION,
+            "rows": len(result),
+            "result_hash": digest,
+            "index": index,
+            "columns": columns,
+        }
+        with open(os.path.join(tmp, SCHEMA_FILE), "w") as f:
+            json.dump(schema, f, indent=2)
+        _swap_in(tmp, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return schema
+
+
+def _swap_in(tmp, path, attempts=5):
+    # rename() cannot replace a non-empty directory: move the old store aside first.
+    # Readers that already mapped its files keep them until they close them.
+    for _ in range(attempts):
+        try:
+            os.rename(tmp, path)
+            return
+        except OSError:
+            pass
+        old = tmp + ".old"
+        try:
+            os.rename(path, old)
+        except FileNotFoundError:
+            continue  # another writer moved it aside first; retry
+        shutil.rmtree(old, ignore_errors=True)
+    raise OSError(f"Could not replace store {path}")
+
+
+def prune_stores(root, keep):
+    """Delete all but the ``keep`` most recently written stores under ``root``.
+
+    Leftovers of interrupted writes older than an hour are removed as well.
+    Returns the names of the deleted stores.
+    """
+    if not os.path.isdir(root):
+        return []
+    entries = [e for e in os.scandir(root) if e.is_dir(follow_symlinks=False)]
+    now = time.time()
+    for e in entries:
+        if e.name.startswith(".") and now - e.stat().st_mtime > 3600:
+            shutil.rmtree(e.path, ignore_errors=True)
+    stores = sorted((e for e in entries if not e.name.startswith(".")),
+                    key=lambda e: e.stat().st_mtime, reverse=True)
+    for e in stores[keep:]:
+        shutil.rmtree(e.path, ignore_errors=True)
+    return [e.name for e in stores[keep:]]
+
+
+class ResultStore:
+    """Read-only view of a store written by ``write_store``.
+
+    Columns are opened with ``mmap_mode="r"``: ``store["tz_h"][10:20]`` only
+    touches the pages holding those rows.
+    """
+
+    def __init__(self, path):
+        self.schema = _read_schema(path)
+        if self.schema["version"] != STORE_VERSION:
+            raise ValueError(f"Unsupported store version {self.schema['version']}")
+        self.path = path
+        self.index = np.load(os.path.join(path, INDEX_FILE), mmap_mode="r")
+        self.columns = {c["name"]: np.load(os.path.join(path, c["file"]), mmap_mode="r")
+                        for c in self.schema["columns"]}
+
+    def __len__(self):
+        return self.schema["rows"]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def to_frame(self, start=None, stop=None):
+        """Decode rows ``start:stop`` into a DataFrame shaped like the original result."""
+        rows = slice(start, stop)
+        data = {c["name"]: _decode(self.columns[c["name"]][rows], c) for c in self.schema["columns"]}
+        return pd.DataFrame(data, index=pd.Index(_decode(self.index[rows], self.schema["index"])))
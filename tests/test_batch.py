@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from batch import *
+
+
+def test_lon_to_tz_frame():
+    df = pd.DataFrame({"dir": ["E", "W"], "deg": [82, 45], "min": [30, 15], "sec": [0.0, 30.0]})
+    res = convert_frame(df)
+    assert list(res["tz_sign"]) == ["+", "-"]
+    assert list(res["tz_h"]) == [5, 3] and list(res["tz_m"]) == [30, 1]
+    assert abs(res["longitude_decimal"][1] + 45.258333333) < 1e-6
+    assert (res["error_code"] == ERR_OK).all()
+
+
+def test_tz_to_lon_frame_caps_at_12h():
+    df = pd.DataFrame({"sign": ["+", "-"], "h": [5, 12], "m": [30, 30], "s": [0.0, 0.0]})
+    res = convert_frame(df)
+    assert list(res["longitude_decimal"]) == [82.5, -180.0]
+    assert list(res["lon_dir"]) == ["E", "W"] and list(res["lon_deg"]) == [82, 180]
+
+
+def test_error_codes():
+    df = pd.DataFrame({"dir": ["E", None, "E"], "deg": ["10", "10", "x"], "min": [0, 0, 0], "sec": [0, 0, 0]})
+    res = convert_frame(df)
+    assert list(res["error_code"]) == [ERR_OK, ERR_MISSING, ERR_INVALID]
+    assert np.isnan(res["longitude_decimal"][2])
+
+
+def test_out_of_range_values_are_invalid():
+    lon = pd.DataFrame({"dir": ["E"] * 6, "deg": [600000, 1e12, -1, 180, 10, 10],
+                        "min": [0, 0, 0, 0, 60, 0], "sec": [0, 0, 0, 0, 0, 60]})
+    tz = pd.DataFrame({"sign": ["+"] * 6, "h": [13, 1e12, -1, 12, 1, 1],
+                       "m": [0, 0, 0, 0, 60, 0], "s": [0, 0, 0, 0, 0, 60.0]})
+    for df in (lon, tz):
+        for exact in (False, True):
+            res = convert_frame(df, exact=exact)
+            assert list(res["error_code"]) == [ERR_INVALID] * 3 + [ERR_OK] + [ERR_INVALID] * 2
+            assert res.filter(regex="_(h|m|deg|min)$").abs().max().max() <= 180
+
+
+def test_sign_must_be_plus_or_minus():
+    df = pd.DataFrame({"sign": [" +", "-", None, "x", "W"], "h": [1] * 5, "m": [0] * 5, "s": [0.0] * 5})
+    res = convert_frame(df)
+    assert list(res["error_code"]) == [ERR_OK, ERR_OK, ERR_MISSING, ERR_INVALID, ERR_INVALID]
+    assert list(res["longitude_decimal"][:2]) == [15.0, -15.0]
+
+
+def test_non_finite_values_are_invalid():
+    df = pd.DataFrame({"dir": ["E", "W"], "deg": [np.inf, 10], "min": [0, -np.inf], "sec": [0, 0]})
+    for exact in (False, True):
+        res = convert_frame(df, exact=exact)
+        assert list(res["error_code"]) == [ERR_INVALID, ERR_INVALID]
+        assert res["longitude_decimal"].isna().all()
+
+
+def test_unrecognised_columns_give_empty_result():
+    assert convert_frame(pd.DataFrame({"a": [1]})).empty
+
+
+def test_result_hash_tracks_content():
+    df = pd.DataFrame({"sign": ["+"], "h": [1], "m": [0], "s": [0.0]})
+    a, b = convert_frame(df), convert_frame(df.assign(h=[2]))
+    assert result_hash(a) == result_hash(convert_frame(df))
+    assert result_hash(a) != result_hash(b)
+
+
+def test_aggregate_size_independent_of_rows():
+    small = aggregate_longitudes(np.array([0.0, 5.0, -170.0]))
+    big = aggregate_longitudes(np.random.default_rng(1).uniform(-180, 180, 200_000))
+    assert len(small["bands"]["counts"]) == len(big["bands"]["counts"]) == 360
+    assert len(big["clusters"]["count"]) <= 25 and len(big["sample"]["lon"]) == 500
+    assert big["bands"]["counts"].sum() == big["clusters"]["count"].sum() == big["total"] == 200_000
+    assert list(small["clusters"]["count"]) == [1, 2]
+
+
+def test_bin_result_counts_every_valid_row():
+    df = pd.DataFrame({"dir": ["E", "W", "E", None], "deg": [7, 100, 179, 1], "min": [30, 0, 0, 0], "sec": [0, 0, 0, 0]})
+    bins = bin_result(convert_frame(df))
+    assert len(bins["offset"]["counts"]) == 48 and bins["offset"]["counts"].sum() == 3
+    assert len(bins["bands"]["counts"]) == 24 and bins["bands"]["counts"][12] == 1
+    assert list(bins["errors"]["counts"]) == [3, 1, 0]
+
+
+def test_update_result_reconverts_only_edited_rows():
+    df = pd.DataFrame({"sign": ["+", "-", "+"], "h": [1, 2, 3], "m": [0, 0, 0], "s": [0.0, 0.0, 0.0]})
+    first = update_result(df)
+    assert first["converted"] == 3
+    assert update_result(df, first)["converted"] == 0
+
+    edited = df.copy()
+    edited.loc[1, "h"] = 4
+    edited.loc[7] = ["+", 5, 0, 0.0]
+    second = update_result(edited.drop(index=0), first)
+    assert second["converted"] == 2
+    assert list(second["frame"].index) == [1, 2, 7]
+    assert list(second["frame"]["longitude_decimal"]) == [-60.0, 45.0, 75.0]
+    pd.testing.assert_frame_equal(second["frame"], convert_frame(edited.drop(index=0)))
+    assert second["key"] != first["key"]
+
+
+def test_update_result_reconverts_when_exact_toggles():
+    df = pd.DataFrame({"sign": ["+", "-"], "h": [1, 2], "m": [0, 0], "s": [0.0, 0.0]})
+    exact = update_result(df, update_result(df), exact=True)
+    assert exact["converted"] == 2 and "tz_us" in exact["frame"]
+
+
+def test_update_result_with_known_edits_skips_rehashing():
+    df = pd.DataFrame({"sign": ["+", "-", "+"], "h": [1, 2, 3], "m": [0, 0, 0], "s": [0.0, 0.0, 0.0]})
+    first = update_result(df)
+    delta = {"edited_rows": {0: {"h": 4}}, "added_rows": [{"sign": "+", "h": 5, "m": 0, "s": 0.0}],
+             "deleted_rows": [1]}
+    edited, changed = apply_edits(df.copy(), df.index, delta)
+    assert list(edited.index) == [0, 2, 3] and changed == [0, 3]
+    known = update_result(edited, first, changed=changed)
+    hashed = update_result(edited, first)
+    assert known["converted"] == hashed["converted"] == 2
+    assert known["key"] == hashed["key"]
+    pd.testing.assert_frame_equal(known["frame"], convert_frame(edited))
+
+
+def test_cell_edits_patch_previous_frame_in_place():
+    df = pd.DataFrame({"sign": ["+", "-", "+", "-"], "h": [1, 2, 3, 4], "m": [0, 0, 0, 0], "s": [0.0] * 4})
+    first = update_result(df)
+    frame, hashes = first["frame"], first["hashes"]
+    edited, changed = apply_edits(df, df.index, {"edited_rows": {2: {"h": 5, "sign": "-"}}})
+    second = update_result(edited, first, changed=changed)
+    assert second["frame"] is frame and second["hashes"] is hashes
+    assert second["converted"] == 1
+    pd.testing.assert_frame_equal(second["frame"], convert_frame(edited))
+    assert second["key"] == update_result(edited)["key"]
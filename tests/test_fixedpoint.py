@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch import convert_frame
+from fixedpoint import *
+
+
+def test_dms_mas_roundtrip():
+    mas = dms_to_mas(73, 59, 7.8, -1)
+    assert mas == -(73 * 3_600_000 + 59 * 60_000 + 7_800)
+    assert [int(v) for v in mas_to_dms(mas)] == [-1, 73, 59, 7_800]
+
+
+def test_no_sixty_second_artefact():
+    # 1/3° = 0:20:00 exactly; the float split gives 59.99999... seconds
+    sgn, d, m, s = mas_to_dms(degrees_to_mas(1 / 3))
+    assert (d, m, s) == (0, 20, 0)
+    sgn, h, m, s = us_to_hms(hours_to_us(5.5))
+    assert (h, m, s) == (5, 30, 0)
+
+
+def test_lon_offset_roundtrips_are_exact():
+    rng = np.random.default_rng(0)
+    mas = rng.integers(-180 * MAS_PER_DEGREE, 180 * MAS_PER_DEGREE, 100_000)
+    assert (us_to_mas(mas_to_us(mas)) == mas).all()
+    us_ms = rng.integers(-12 * 3_600_000, 12 * 3_600_000, 100_000) * 1000
+    assert (mas_to_us(us_to_mas(us_ms)) == us_ms).all()
+    assert mas_to_us(15 * MAS_PER_DEGREE) == US_PER_HOUR
+
+
+def test_exact_batch_roundtrip():
+    lon = pd.DataFrame({"dir": ["E", "W", "E", None], "deg": [82, 45, 179, 1], "min": [30, 15, 59, 0],
+                        "sec": [0.0, 30.5, 59.999, 0.0]})
+    there = convert_frame(lon, exact=True)
+    # 179°59'59.999" is 11:59:59.99993, which carries to 12:00:00.000 at millisecond display
+    assert list(there["tz_h"]) == [5, 3, 12, 0] and list(there["tz_m"]) == [30, 1, 0, 0]
+    assert list(there["tz_s"][:3]) == [0.0, 2.033, 0.0]
+    back = convert_frame(there)
+    assert list(back["input_type"]) == ["tz->lon"] * 4
+    assert (back["longitude_mas"] == there["longitude_mas"]).all()
+    assert list(back["lon_dir"][:3]) == list(lon["dir"][:3]) and list(back["lon_sec"][:3]) == list(lon["sec"][:3])
+    assert list(back["error_code"]) == list(there["error_code"])
+    pd.testing.assert_frame_equal(convert_frame(back), there)
+
+
+def test_exact_batch_roundtrip_random():
+    rng = np.random.default_rng(0)
+    n = 200_000
+    lon = pd.DataFrame({"dir": rng.choice(["E", "W"], n), "deg": rng.integers(0, 180, n),
+                        "min": rng.integers(0, 60, n), "sec": rng.integers(0, 60_000, n) / 1000})
+    there = convert_frame(lon, exact=True)
+    assert (convert_frame(there)["longitude_mas"] == there["longitude_mas"]).all()
+
+
+def test_float_batch_never_shows_sixty_seconds():
+    rng = np.random.default_rng(0)
+    n = 200_000
+    tz = pd.DataFrame({"sign": rng.choice(["+", "-"], n), "h": rng.integers(0, 12, n),
+                       "m": rng.integers(0, 60, n), "s": rng.integers(0, 60_000, n) / 1000})
+    lon = convert_frame(tz)
+    assert lon["lon_sec"].max() < 60 and lon["lon_min"].max() < 60
+    back = convert_frame(lon.rename(columns={"lon_dir": "dir", "lon_deg": "deg", "lon_min": "min", "lon_sec": "sec"})
+                         [["dir", "deg", "min", "sec"]])
+    assert back["tz_s"].max() < 60 and back["tz_m"].max() < 60
+
+
+def test_out_of_range_values_raise():
+    for call in (lambda: degrees_to_mas(1e12), lambda: hours_to_us(np.inf), lambda: dms_to_mas(1e12, 0, 0),
+                 lambda: hms_to_us(0, 0, np.nan), lambda: mas_to_us(2 ** 60), lambda: us_to_mas(-(2 ** 60))):
+        with pytest.raises(ValueError):
+            call()
+
+
+def test_exact_batch_flags_out_of_range_rows():
+    lon = pd.DataFrame({"dir": ["E"] * 3, "deg": [1e12, 1e30, 10], "min": [0, 0, 0], "sec": [0, 0, 0]})
+    res = convert_frame(lon, exact=True)
+    assert list(res["error_code"]) == [2, 2, 0] and list(res["tz_h"]) == [0, 0, 0]
+    assert list(res["tz_m"]) == [0, 0, 40]
+    tz = pd.DataFrame({"tz_us": [US_PER_HOUR, 13 * US_PER_HOUR, 2.0 ** 62, 1.5]})
+    assert list(convert_frame(tz)["error_code"]) == [0, 2, 2, 2]
+    assert convert_frame(tz)["longitude_mas"][0] == 15 * MAS_PER_DEGREE
@@ -0,0 +1,54 @@
+import asyncio
+
+from loadtest import Session, compare, latency_summary, run_actions, summarize
+
+
+def test_latency_summary_percentiles():
+    s = latency_summary([i / 1000 for i in range(1, 101)])
+    assert s["count"] == 100 and s["max"] == 100.0
+    assert abs(s["p50"] - 50.5) < 1e-9 and s["p99"] > s["p95"] > s["p50"]
+    assert latency_summary([])["p50"] is None
+
+
+def test_summarize_excludes_page_load_and_counts_errors():
+    timings = [("load", 2.0, None), ("slider", 0.1, None), ("slider", 0.3, "boom"),
+               ("upload", 0.0, "no file_uploader labelled '' in the last run")]
+    r = summarize(timings, sessions=2, wall=1.0, memory_bytes=2 * 2**20)
+    assert r["reruns"] == 2 and r["throughput_rps"] == 2.0
+    assert r["failed_reruns"] == 2 and r["memory_per_session_mb"] == 1.0
+    assert r["per_action"]["load"]["count"] == 1 and r["per_action"]["upload"]["count"] == 0
+
+
+def test_compare_reports_relative_change():
+    base = summarize([("slider", 0.1, None)], 1, 1.0, None)
+    new = summarize([("slider", 0.2, None)], 1, 1.0, None)
+    lines = compare(base, new)
+    assert any("latency_ms.p50" in l and "+100.0%" in l for l in lines)
+    assert any("memory_per_session_mb" in l and "None" in l for l in lines)
+
+
+class _Socket:
+    async def send(self, data):
+        pass
+
+    async def close(self):
+        pass
+
+
+class _StuckSession(Session):
+    # A server that never finishes a rerun, not even after stop_script
+    def __init__(self):
+        super().__init__("http://127.0.0.1", timeout=0.01)
+        self.ws = _Socket()
+        self.widgets = {("slider", "Longitude slider (±180°)"): "slider-id"}
+
+    async def _until_finished(self):
+        await asyncio.sleep(1)
+
+
+def test_stuck_session_is_dropped_not_fatal():
+    session = _StuckSession()
+    asyncio.run(run_actions(session, actions=5, rows=10, seed=0, weights=(1, 0, 0)))
+    assert session.dropped and len(session.timings) == 1
+    r = summarize(session.timings, sessions=1, wall=1.0, memory_bytes=None)
+    assert r["failed_reruns"] == 1 and r["dropped_sessions"] == 1
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from batch import bin_result, convert_frame
+from plots import render_summary
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+def test_render_summary_png():
+    df = pd.DataFrame({"dir": ["E", "W", None], "deg": [82, 45, 1], "min": [30, 15, 0], "sec": [0.0, 30.0, 0.0]})
+    assert render_summary(bin_result(convert_frame(df))).startswith(PNG)
+
+
+def test_render_summary_only_flagged_rows():
+    df = pd.DataFrame({"sign": [None, "x"], "h": [1, 1], "m": [0, 0], "s": [0.0, 0.0]})
+    bins = bin_result(convert_frame(df))
+    assert bins["offset"]["counts"].sum() == 0
+    assert render_summary(bins).startswith(PNG)
@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch import convert_frame, result_hash
+from convert import main
+from store import *
+
+
+def _result():
+    df = pd.DataFrame({"dir": ["E", "W", None], "deg": [82, 45, 1], "min": [30, 15, 0], "sec": [0.0, 30.0, 0.0]})
+    return convert_frame(df)
+
+
+def test_store_roundtrip(tmp_path):
+    res = _result()
+    write_store(res, tmp_path)
+    store = ResultStore(tmp_path)
+    assert len(store) == 3
+    assert isinstance(store["tz_h"], np.memmap)
+    pd.testing.assert_frame_equal(store.to_frame(), res, check_index_type=False)
+
+
+def test_store_slices_rows(tmp_path):
+    res = _result()
+    write_store(res, tmp_path)
+    part = ResultStore(tmp_path).to_frame(1, 3)
+    assert list(part.index) == [1, 2]
+    assert list(part["tz_sign"]) == ["-", "+"] and list(part["error_code"]) == [0, 1]
+
+
+def test_cli_writes_csv_and_store(tmp_path):
+    src = tmp_path / "in.csv"
+    pd.DataFrame({"sign": ["+"], "h": [5], "m": [30], "s": [0.0]}).to_csv(src, index=False)
+    main([str(src), "--csv", str(tmp_path / "out.csv"), "--store", str(tmp_path / "store")])
+    assert pd.read_csv(tmp_path / "out.csv")["longitude_decimal"][0] == 82.5
+    assert ResultStore(tmp_path / "store")["lon_deg"][0] == 82
+
+
+def test_store_keeps_text_index(tmp_path):
+    res = _result().set_axis(["a", "b", "c"])
+    write_store(res, tmp_path)
+    assert list(ResultStore(tmp_path).to_frame().index) == ["a", "b", "c"]
+
+
+def test_rewrite_drops_stale_columns(tmp_path):
+    df = pd.DataFrame({"sign": ["+"], "h": [5], "m": [30], "s": [0.0]})
+    write_store(convert_frame(df, exact=True), tmp_path)
+    write_store(convert_frame(df), tmp_path)
+    assert not (tmp_path / "longitude_mas.npy").exists()
+    assert "longitude_mas" not in ResultStore(tmp_path).columns
+
+
+def test_store_dir_stays_under_root(tmp_path):
+    assert store_dir(tmp_path, "abc") == str((tmp_path / "abc").resolve())
+    for name in ("../abc", "/etc", "a/b", ".."):
+        with pytest.raises(ValueError):
+            store_dir(tmp_path, name)
+
+
+def test_concurrent_writers_leave_a_complete_store(tmp_path):
+    results = [_result(), convert_frame(pd.DataFrame({"sign": ["+"], "h": [5], "m": [30], "s": [0.0]}), exact=True)]
+    path = tmp_path / "store"
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: write_store(results[i % 2], path), range(16)))
+    store = ResultStore(path)
+    assert store.schema["result_hash"] in {result_hash(r) for r in results}
+    assert sorted(os.listdir(path)) == sorted([c["file"] for c in store.schema["columns"]] + ["_index.npy", "schema.json"])
+    assert os.listdir(tmp_path) == ["store"]
+
+
+def test_replaced_store_stays_readable(tmp_path):
+    write_store(_result(), tmp_path / "s")
+    before = ResultStore(tmp_path / "s")
+    write_store(convert_frame(pd.DataFrame({"sign": ["+"], "h": [5], "m": [30], "s": [0.0]})), tmp_path / "s")
+    assert list(before["tz_h"]) == [5, 3, 0]
+
+
+def test_prune_keeps_newest_stores(tmp_path):
+    for i, name in enumerate("abc"):
+        write_store(_result().assign(error_code=i), tmp_path / name)
+        os.utime(tmp_path / name, (i, i))
+    assert prune_stores(tmp_path, keep=2) == ["a"]
+    assert sorted(os.listdir(tmp_path)) == ["b", "c"]